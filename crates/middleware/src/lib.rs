@@ -2,7 +2,7 @@ use serde::Deserialize;
 use serde_json as json;
 use std::collections::hash_map::DefaultHasher;
 use std::collections::{HashSet, HashMap};
-use std::fs::{self, File};
+use std::fs::File;
 use std::hash::{Hash, Hasher};
 use std::process::{ExitStatus, Stdio};
 use std::time;
@@ -124,6 +124,13 @@ impl Data {
             bytes: s.to_string(),
         }
     }
+    /// Borrow the text of a `Data::Text`, `None` for base64 encoded bytes.
+    fn as_text(&self) -> Option<&str> {
+        match self {
+            Data::Text { text } => Some(text),
+            Data::Bytes { .. } => None,
+        }
+    }
 }
 
 #[derive(Clone, Debug, Deserialize, PartialEq, Eq)]
@@ -146,8 +153,11 @@ struct Duration {
 
 /// Decode JSON Lines into a Vec<Message>. If there was an error decoding,
 /// this function panics.
-pub fn json_decode(jsonlines: &str) -> Vec<Message> {
-    json::Deserializer::from_str(jsonlines)
+///
+/// Takes raw bytes as well as `&str`: serde_json checks UTF-8 as it parses,
+/// so ripgrep output does not need decoding into a String first.
+pub fn json_decode<T: AsRef<[u8]> + ?Sized>(jsonlines: &T) -> Vec<Message> {
+    json::Deserializer::from_slice(jsonlines.as_ref())
         .into_iter()
         .collect::<Result<Vec<Message>, _>>()
         .unwrap()
@@ -174,8 +184,8 @@ impl RipgrepService {
             .unwrap();
         let mut stdout = child.stdout.take().expect("Stdout is not available");
         let read = async move {
-            let mut data = String::new();
-            stdout.read_to_string(&mut data).await.map(|_| data)
+            let mut data = Vec::new();
+            stdout.read_to_end(&mut data).await.map(|_| data)
         };
         let output = read.await;
         let msgs = json_decode(&output.unwrap());
@@ -212,99 +222,96 @@ pub async fn run_ripgrep_service_and_index(
     for each_msg in msgs.iter() {
         match each_msg {
             Message::Begin(begin_msg) => {
-                println!("stdout: {:#?}", each_msg);
+                log::debug!("stdout: {:#?}", each_msg);
                 article = Article::default();
 
                 // get path
-                let path: Option<Data> = begin_msg.path.clone();
-                let path_text = match path {
-                    Some(Data::Text { text }) => text,
-                    _ => {
+                let path_text = match begin_msg.path.as_ref().and_then(Data::as_text) {
+                    Some(text) => text,
+                    None => {
                         println!("Error: path is not text");
                         continue;
                     }
                 };
 
-                if existing_paths.contains(&path_text) {
+                if existing_paths.contains(path_text) {
                     continue;
                 }
-                existing_paths.insert(path_text.clone());
+                existing_paths.insert(path_text.to_string());
                 
 
                 let id = calculate_hash(&path_text);
                 article.id = Some(id.clone());
-                article.title = path_text.clone();
-                article.url = path_text.clone();
+                article.title = path_text.to_string();
+                article.url = path_text.to_string();
                 
             }
             Message::Match(match_msg) => {
-                println!("stdout: {:#?}", article);
-                let path = match_msg.path.clone();
-                let path = path.unwrap();
-                let path_text = match path {
-                    Data::Text { text } => text,
-                    _ => {
+                log::debug!("stdout: {:#?}", article);
+                let path_text = match match_msg.path.as_ref().unwrap().as_text() {
+                    Some(text) => text,
+                    None => {
                         println!("Error: path is not text");
                         continue;
                     }
                 };
-                let body = fs::read_to_string(path_text).unwrap();
-                article.body = body;
+                // A file produces one Match message per matching line;
+                // its body only needs reading for the first of them
+                if article.body.is_empty() {
+                    article.body = tokio::fs::read_to_string(path_text).await.unwrap();
+                }
 
-                let lines = match &match_msg.lines {
-                    Data::Text { text } => text,
-                    _ => {
+                let lines = match match_msg.lines.as_text() {
+                    Some(text) => text,
+                    None => {
                         println!("Error: lines is not text");
                         continue;
                     }
                 };
                 match article.description {
                     Some(description) => {
-                        article.description = Some(description + " " + &lines);
+                        article.description = Some(description + " " + lines);
                     }
                     None => {
-                        article.description = Some(lines.clone());
+                        article.description = Some(lines.to_string());
                     }
                 }
             }
             Message::Context(context_msg) => {
                 // let article = Article::new(context_msg.clone());
-                println!("stdout: {:#?}", article);
-
-                let article_url = article.url.clone();
-                let path = context_msg.path.clone();
-                let path = path.unwrap();
-                let path_text = match path {
-                    Data::Text { text } => text,
-                    _ => {
+                log::debug!("stdout: {:#?}", article);
+
+                let path_text = match context_msg.path.as_ref().unwrap().as_text() {
+                    Some(text) => text,
+                    None => {
                         println!("Error: path is not text");
                         continue;
                     }
                 };
 
                 // We got a context for a different article
-                if article_url != path_text {
+                if article.url != path_text {
                     continue;
                 }
 
-                let lines = match &context_msg.lines {
-                    Data::Text { text } => text,
-                    _ => {
+                let lines = match context_msg.lines.as_text() {
+                    Some(text) => text,
+                    None => {
                         println!("Error: lines is not text");
                         continue;
                     }
                 };
                 match article.description {
                     Some(description) => {
-                        article.description = Some(description + " " + &lines);
+                        article.description = Some(description + " " + lines);
                     }
                     None => {
-                        article.description = Some(lines.clone());
+                        article.description = Some(lines.to_string());
                     }
                 }
             }
             Message::End(end_msg) => {
-                println!("stdout: {:#?}", each_msg);
+                log::debug!("stdout: {:#?}", each_msg);
                 // The `End` message could be received before the `Begin` message
                 // causing the article to be empty
                 let id = match article.id {
@@ -341,21 +348,26 @@ pub async fn search_haystacks(config_state:ConfigState, search_query:SearchQuery
     // FIXME: this fails when role name arrives in lowercase
     let role_config = current_config_state.roles.get(role).unwrap();
     println!(" role_config: {:#?}", role_config);
-    let mut articles_cached:HashMap<String,Article> = HashMap::new();
+    // Haystacks are independent, so run a ripgrep process for each of them
+    // at once instead of waiting for one to finish before starting the next
+    let mut searches = tokio::task::JoinSet::new();
     for each_haystack in &role_config.haystacks {
         println!(" each_haystack: {:#?}", each_haystack);
-        articles_cached = match each_haystack.service.as_str() {
+        match each_haystack.service.as_str() {
             "ripgrep" => {
                 let needle = search_query.search_term.clone();
                 let haystack = each_haystack.haystack.clone();
-                // return cached articles
-                run_ripgrep_service_and_index(config_state.clone(), needle, haystack).await
+                searches.spawn(run_ripgrep_service_and_index(config_state.clone(), needle, haystack));
             }
             _ => {
                 println!("Haystack service not supported, hence skipping");
-                HashMap::new()
             }
         };
     };
+    // return cached articles from all haystacks
+    let mut articles_cached:HashMap<String,Article> = HashMap::new();
+    while let Some(articles) = searches.join_next().await {
+        articles_cached.extend(articles.expect("Haystack search task failed"));
+    }
     articles_cached
-}
\ No newline at end of file
+}
@@ -1,29 +1,61 @@
 import csv
 import gzip
+import io
+import os
+import zlib
 
-# Open the gzipped CSV file and read the rows
-with gzip.open('./data/output.csv.gz', 'rt', newline='') as csvfile:
-    reader = csv.DictReader(csvfile)
-    rows = list(reader)
+# Files that inflate to at most this many bytes are decompressed in one
+# call; anything bigger is streamed through gzip to bound peak memory
+SLURP_MAX_BYTES = 8 * 1024 * 1024
 
-# Store each row in a dictionary
+
+def slurp_gz(path):
+    # Inflate at most SLURP_MAX_BYTES + 1 bytes, so the cap holds however
+    # well the file compresses. Returns None when the file should be
+    # streamed instead: too big, truncated, or more than one gzip member
+    if os.path.getsize(path) > SLURP_MAX_BYTES:
+        return None
+    with open(path, 'rb') as f:
+        raw = f.read()
+    inflate = zlib.decompressobj(31)  # wbits=31 selects the gzip container
+    data = inflate.decompress(raw, SLURP_MAX_BYTES + 1)
+    if len(data) > SLURP_MAX_BYTES or not inflate.eof or inflate.unused_data:
+        return None
+    return data
+
+
+def read_gz_csv(path):
+    data = slurp_gz(path)
+    if data is not None:
+        # Decode incrementally rather than materialising the whole text
+        text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', newline='')
+        yield from csv.reader(text)
+    else:
+        # gzip decodes every member and raises EOFError on truncation
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as csvfile:
+            yield from csv.reader(csvfile)
+
+
+# Build the dictionary from the gzipped CSV file, one row at a time
+# Columns are positional: term, id, parent_id
 data = {}
 patterns = list()
-for row in rows:
-    term = row['term']
+for term, id, parent_id in read_gz_csv('./data/output.csv.gz'):
     patterns.append(term)
-    id = row['id']
-    parent_id = row['parent_id']
-    data[term] = {'id': id, 'parent_id': parent_id}
+    data[term] = (id, parent_id)
 
 # Print the data dictionary
 # print(data)
 haystack = "I am a text with the word Organization strategic plan and bar and project calendar"
 print(haystack)
 import ahocorasick_rs
-ac = ahocorasick_rs.AhoCorasick(patterns, matchkind=ahocorasick_rs.MatchKind.LeftmostLongest)
+ac = ahocorasick_rs.AhoCorasick(
+    patterns,
+    matchkind=ahocorasick_rs.MatchKind.LeftmostLongest,
+    implementation=ahocorasick_rs.Implementation.DFA,
+)
 matches=ac.find_matches_as_indexes(haystack)
 print(matches)
 for match in matches:
     print(patterns[match[0]])
-    print(data[patterns[match[0]]])
\ No newline at end of file
+    print(data[patterns[match[0]]])
@@ -1,6 +1,8 @@
 pub mod matcher;
 
-pub use matcher::{find_matches, replace_matches, Dictionary, Matched};
+pub use matcher::{
+    find_matches, replace_matches, Dictionary, Matched, Matcher, MatcherBuilder, Thesaurus,
+};
 // use std::collections::HashMap;
 use ahash::AHashMap;
 use std::fs::File;
@@ -17,64 +19,111 @@ pub enum TerraphimAutomataError {
     Serde(#[from] serde_json::Error),
     #[error("IO error: {0}")]
     Io(#[from] std::io::Error),
+    #[cfg(feature = "simd-json")]
+    #[error("SIMD JSON deserialization error: {0}")]
+    SimdJson(#[from] simd_json::Error),
 }
 
 pub type Result<T> = std::result::Result<T, TerraphimAutomataError>;
 
+/// Parse a thesaurus from raw JSON bytes, e.g. one embedded with `include_bytes!`.
+pub fn load_automata_from_bytes(bytes: &[u8]) -> Result<AHashMap<String, Dictionary>> {
+    let dict_hash = serde_json::from_slice(bytes)?;
+    Ok(dict_hash)
+}
+
+/// Parse a thesaurus from raw JSON bytes straight into `Matcher`-ready
+/// parallel arrays, without building the intermediate hash map.
+pub fn load_thesaurus_from_bytes(bytes: &[u8]) -> Result<Thesaurus> {
+    let thesaurus = serde_json::from_slice(bytes)?;
+    Ok(thesaurus)
+}
+
 pub async fn load_automata(url_or_file: &str) -> Result<AHashMap<String, Dictionary>> {
     /// TODO: use async version of reqwest
-    async fn read_url(url: &str) -> Result<String> {
+    async fn read_url(url: &str) -> Result<Vec<u8>> {
         let response = reqwest::Client::new()
         .get(url)
         .header("Accept", "application/json")
         .send()
         .await?;
 
-        let text = response.text().await?;
-        
-        Ok(text)
+        // Raw bytes: serde_json validates UTF-8 while parsing, so
+        // decoding into a String first would scan the body twice
+        let bytes = response.bytes().await?;
+
+        // Takes over the buffer without copying when it is uniquely owned
+        Ok(Vec::from(bytes))
     }
     let contents = if url_or_file.starts_with("http") {
         read_url(url_or_file).await?
     } else {
         let mut file = File::open(Path::new(url_or_file))?;
-        let mut contents = String::new();
-        file.read_to_string(&mut contents)?;
+        let mut contents = Vec::new();
+        file.read_to_end(&mut contents)?;
         contents
     };
 
-    let dict_hash = serde_json::from_str(&contents)?;
+    parse_owned(contents)
+}
+
+/// Parse a thesaurus from a buffer the loader owns.
+///
+/// With the `simd-json` feature the buffer is tokenized in place, which is
+/// why it is taken by value rather than borrowed.
+#[cfg(feature = "simd-json")]
+fn parse_owned(mut contents: Vec<u8>) -> Result<AHashMap<String, Dictionary>> {
+    let dict_hash = simd_json::serde::from_slice(&mut contents)?;
     Ok(dict_hash)
 }
 
+#[cfg(not(feature = "simd-json"))]
+fn parse_owned(contents: Vec<u8>) -> Result<AHashMap<String, Dictionary>> {
+    load_automata_from_bytes(&contents)
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
 
-    #[test]
-    fn test_load_automata_from_file() {
-        let dict_hash = load_automata("tests/test_data.csv.gz").unwrap();
+    #[tokio::test]
+    async fn test_load_automata_from_file() {
+        let dict_hash = load_automata("tests/test_data.json").await.unwrap();
         assert_eq!(dict_hash.len(), 3);
-        assert_eq!(dict_hash.get("foo").unwrap().id, "1");
-        assert_eq!(dict_hash.get("bar").unwrap().id, "2");
-        assert_eq!(dict_hash.get("baz").unwrap().id, "3");
-        assert_eq!(dict_hash.get("foo").unwrap().parent, None);
-        assert_eq!(dict_hash.get("bar").unwrap().parent, Some("1".to_string()));
-        assert_eq!(dict_hash.get("baz").unwrap().parent, Some("2".to_string()));
+        assert_eq!(dict_hash.get("foo").unwrap().id, 1);
+        assert_eq!(dict_hash.get("bar").unwrap().id, 2);
+        assert_eq!(dict_hash.get("baz").unwrap().id, 2);
+        assert_eq!(dict_hash.get("baz").unwrap().nterm, "bar");
     }
 
     #[test]
-    fn test_load_automata_from_url() {
+    fn test_load_thesaurus_from_bytes() {
+        let json = br#"{
+            "project calendar": {"id": 1, "nterm": "project schedule"},
+            "strategic plan": {"id": 2, "nterm": "strategy"},
+            "organization strategic plan": {"id": 3, "nterm": "strategy"}
+        }"#;
+        let thesaurus = load_thesaurus_from_bytes(json).unwrap();
+        assert_eq!(thesaurus.len(), 3);
+
+        let text = "I am a text with the word Organization strategic plan and project calendar";
+        let matches = Matcher::from_thesaurus(thesaurus)
+            .unwrap()
+            .find_matches(text, true);
+        let dict_hash = load_automata_from_bytes(json).unwrap();
+        assert_eq!(matches, Matcher::new(&dict_hash).unwrap().find_matches(text, true));
+        assert_eq!(matches[0].id, 3);
+        assert_eq!(&*matches[1].nterm, "project schedule");
+    }
+
+    #[tokio::test]
+    #[ignore = "fetches the thesaurus over the network"]
+    async fn test_load_automata_from_url() {
         let dict_hash = load_automata(
-            "https://raw.githubusercontent.com/github/copilot-sample-code/main/test_data.csv.gz",
+            "https://system-operator.s3.eu-west-2.amazonaws.com/term_to_id.json",
         )
+        .await
         .unwrap();
-        assert_eq!(dict_hash.len(), 3);
-        assert_eq!(dict_hash.get("foo").unwrap().id, "1");
-        assert_eq!(dict_hash.get("bar").unwrap().id, "2");
-        assert_eq!(dict_hash.get("baz").unwrap().id, "3");
-        assert_eq!(dict_hash.get("foo").unwrap().parent, None);
-        assert_eq!(dict_hash.get("bar").unwrap().parent, Some("1".to_string()));
-        assert_eq!(dict_hash.get("baz").unwrap().parent, Some("2".to_string()));
+        assert!(!dict_hash.is_empty());
     }
 }
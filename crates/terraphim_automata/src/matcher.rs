@@ -1,14 +1,27 @@
-use serde::{Deserialize, Serialize};
-use ahash::AHashMap;
+use serde::de::{MapAccess, Visitor};
+use serde::{Deserialize, Deserializer, Serialize};
+use ahash::{AHashMap, AHashSet};
+use std::borrow::Cow;
 use std::error::Error;
+use std::fmt;
+use std::io::{self, Write};
+use std::ops::ControlFlow;
+use std::sync::{Arc, OnceLock};
 
-use aho_corasick::{AhoCorasick, MatchKind};
+use aho_corasick::{packed, AhoCorasick, AhoCorasickKind, Input, MatchKind, Span};
+
+/// Largest thesaurus searched with the packed (Teddy) SIMD searcher.
+const PACKED_MAX_PATTERNS: usize = 64;
+/// Shortest pattern the packed searcher is used for.
+const PACKED_MIN_PATTERN_LEN: usize = 2;
+/// Texts at least this long are scanned in parallel chunks.
+const PARALLEL_MIN_BYTES: usize = 256 * 1024;
 
 #[derive(Debug, PartialEq, Clone)]
 pub struct Matched {
-    pub term: String,
+    pub term: Arc<str>,
     pub id: u64,
-    pub nterm: String,
+    pub nterm: Arc<str>,
     pub pos: Option<(usize, usize)>,
 }
 
@@ -18,34 +31,485 @@ pub struct Dictionary {
     pub nterm: String,
 }
 
+/// Thesaurus held as parallel arrays, in the order the entries were read.
+///
+/// Deserializing into this instead of `AHashMap<String, Dictionary>` skips
+/// the intermediate hash map: terms are copied once into the `Arc<str>` a
+/// `Matcher` keeps, and synonyms share one interned normalized term as
+/// they are read. As with the map, a term that appears more than once
+/// keeps its last entry.
+#[derive(Debug, Default, Clone)]
+pub struct Thesaurus {
+    terms: Vec<Arc<str>>,
+    ids: Vec<u64>,
+    nterms: Vec<Arc<str>>,
+}
+
+impl Thesaurus {
+    pub fn len(&self) -> usize {
+        self.terms.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.terms.is_empty()
+    }
+
+    fn with_capacity(capacity: usize) -> Self {
+        Self {
+            terms: Vec::with_capacity(capacity),
+            ids: Vec::with_capacity(capacity),
+            nterms: Vec::with_capacity(capacity),
+        }
+    }
+}
+
+/// Hands out one shared `Arc<str>` per distinct string.
+#[derive(Default)]
+struct Interner(AHashSet<Arc<str>>);
+
+impl Interner {
+    fn intern(&mut self, s: &str) -> Arc<str> {
+        if let Some(interned) = self.0.get(s) {
+            return Arc::clone(interned);
+        }
+        let interned: Arc<str> = Arc::from(s);
+        self.0.insert(Arc::clone(&interned));
+        interned
+    }
+}
+
+impl From<&AHashMap<String, Dictionary>> for Thesaurus {
+    fn from(dict_hash: &AHashMap<String, Dictionary>) -> Self {
+        let mut thesaurus = Thesaurus::with_capacity(dict_hash.len());
+        let mut interner = Interner::default();
+        for (key, value) in dict_hash.iter() {
+            thesaurus.terms.push(Arc::from(key.as_str()));
+            thesaurus.ids.push(value.id);
+            thesaurus.nterms.push(interner.intern(&value.nterm));
+        }
+        thesaurus
+    }
+}
+
+impl<'de> Deserialize<'de> for Thesaurus {
+    fn deserialize<D: Deserializer<'de>>(deserializer: D) -> Result<Self, D::Error> {
+        // Borrow from the input where there are no escapes to undo
+        #[derive(Deserialize)]
+        struct Term<'a>(#[serde(borrow)] Cow<'a, str>);
+
+        #[derive(Deserialize)]
+        struct Entry<'a> {
+            id: u64,
+            #[serde(borrow)]
+            nterm: Cow<'a, str>,
+        }
+
+        struct ThesaurusVisitor;
+
+        impl<'de> Visitor<'de> for ThesaurusVisitor {
+            type Value = Thesaurus;
+
+            fn expecting(&self, f: &mut fmt::Formatter) -> fmt::Result {
+                f.write_str("a map of terms to their id and normalized term")
+            }
+
+            fn visit_map<M: MapAccess<'de>>(self, mut map: M) -> Result<Thesaurus, M::Error> {
+                let mut thesaurus = Thesaurus::with_capacity(map.size_hint().unwrap_or(0));
+                let mut interner = Interner::default();
+                let mut seen: AHashMap<Arc<str>, usize> = AHashMap::default();
+                while let Some((Term(term), entry)) = map.next_entry::<Term, Entry>()? {
+                    let nterm = interner.intern(&entry.nterm);
+                    if let Some(&i) = seen.get(term.as_ref()) {
+                        thesaurus.ids[i] = entry.id;
+                        thesaurus.nterms[i] = nterm;
+                        continue;
+                    }
+                    let term: Arc<str> = Arc::from(term.as_ref());
+                    seen.insert(Arc::clone(&term), thesaurus.terms.len());
+                    thesaurus.terms.push(term);
+                    thesaurus.ids.push(entry.id);
+                    thesaurus.nterms.push(nterm);
+                }
+                Ok(thesaurus)
+            }
+        }
+
+        deserializer.deserialize_map(ThesaurusVisitor)
+    }
+}
+
+/// Aho-Corasick automaton compiled once from a thesaurus.
+///
+/// Building the automaton is the expensive part of matching, so callers
+/// that scan more than one text against the same thesaurus should build a
+/// `Matcher` once and reuse it instead of calling `find_matches` /
+/// `replace_matches` repeatedly.
+#[derive(Debug, Clone)]
+pub struct Matcher {
+    engine: Engine,
+    // patterns and their dictionary entries, indexed by pattern id;
+    // strings are shared with every `Matched` instead of cloned per match
+    patterns: Vec<Arc<str>>,
+    ids: Vec<u64>,
+    nterms: Vec<Arc<str>>,
+    // replacement text per pattern, rendered once at build time
+    replacements: Vec<Box<[u8]>>,
+}
+
+#[derive(Debug, Clone)]
+enum Engine {
+    Automaton(AhoCorasick),
+    // Teddy is case sensitive, so this searcher is built over ASCII
+    // lowercased patterns and runs over an ASCII lowercased haystack.
+    // Lowercasing is byte for byte, so match offsets are unchanged.
+    Packed(packed::Searcher),
+}
+
+/// Builder for a `Matcher`.
+#[derive(Debug, Clone)]
+pub struct MatcherBuilder {
+    packed: bool,
+    kind: Option<AhoCorasickKind>,
+}
+
+impl Default for MatcherBuilder {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+impl MatcherBuilder {
+    pub fn new() -> Self {
+        Self {
+            packed: true,
+            kind: None,
+        }
+    }
+
+    /// Use the packed SIMD searcher for small thesauri (enabled by default).
+    ///
+    /// It only kicks in when there are at most 64 patterns, each at least
+    /// two bytes long; larger thesauri always use the automaton.
+    pub fn packed(&mut self, yes: bool) -> &mut Self {
+        self.packed = yes;
+        self
+    }
+
+    /// Choose the automaton implementation, `None` lets aho-corasick decide.
+    ///
+    /// `Some(AhoCorasickKind::DFA)` costs more memory and build time but does
+    /// a single transition lookup per byte, which pays off for long-lived
+    /// matchers over large thesauri that scan many documents.
+    pub fn kind(&mut self, kind: Option<AhoCorasickKind>) -> &mut Self {
+        self.kind = kind;
+        self
+    }
+
+    pub fn build(
+        &self,
+        dict_hash: &AHashMap<String, Dictionary>,
+    ) -> Result<Matcher, aho_corasick::BuildError> {
+        self.build_thesaurus(Thesaurus::from(dict_hash))
+    }
+
+    pub fn build_thesaurus(
+        &self,
+        thesaurus: Thesaurus,
+    ) -> Result<Matcher, aho_corasick::BuildError> {
+        let Thesaurus {
+            terms: patterns,
+            ids,
+            nterms,
+        } = thesaurus;
+        let engine = match self.build_packed(&patterns) {
+            Some(searcher) => Engine::Packed(searcher),
+            None => Engine::Automaton(
+                AhoCorasick::builder()
+                    .match_kind(MatchKind::LeftmostLongest)
+                    .ascii_case_insensitive(true)
+                    .kind(self.kind)
+                    .build(patterns.iter().map(|p| p.as_bytes()))?,
+            ),
+        };
+        let replacements = ids
+            .iter()
+            .map(|id| id.to_string().into_bytes().into_boxed_slice())
+            .collect();
+        Ok(Matcher {
+            engine,
+            patterns,
+            ids,
+            nterms,
+            replacements,
+        })
+    }
+
+    fn build_packed(&self, patterns: &[Arc<str>]) -> Option<packed::Searcher> {
+        if !self.packed
+            || patterns.len() > PACKED_MAX_PATTERNS
+            || patterns.iter().any(|p| p.len() < PACKED_MIN_PATTERN_LEN)
+        {
+            return None;
+        }
+        packed::Config::new()
+            .match_kind(packed::MatchKind::LeftmostLongest)
+            .builder()
+            .extend(patterns.iter().map(|p| p.to_ascii_lowercase()))
+            .build()
+    }
+}
+
+impl Matcher {
+    pub fn builder() -> MatcherBuilder {
+        MatcherBuilder::new()
+    }
+
+    pub fn new(dict_hash: &AHashMap<String, Dictionary>) -> Result<Self, aho_corasick::BuildError> {
+        Self::builder().build(dict_hash)
+    }
+
+    pub fn from_thesaurus(thesaurus: Thesaurus) -> Result<Self, aho_corasick::BuildError> {
+        Self::builder().build_thesaurus(thesaurus)
+    }
+
+    /// Calls `f` with `(pattern id, start, end)` for every leftmost-longest
+    /// match, stopping early once `f` returns `ControlFlow::Break`.
+    fn for_each_match<F>(&self, text: &[u8], mut f: F)
+    where
+        F: FnMut(usize, usize, usize) -> ControlFlow<()>,
+    {
+        let lowered;
+        let haystack = match &self.engine {
+            Engine::Automaton(_) => text,
+            Engine::Packed(_) => {
+                lowered = text.to_ascii_lowercase();
+                &lowered[..]
+            }
+        };
+        if haystack.len() >= PARALLEL_MIN_BYTES {
+            let threads = parallelism();
+            if threads > 1 {
+                for (pattern, start, end) in self.find_all_parallel(haystack, threads) {
+                    if f(pattern, start, end).is_break() {
+                        break;
+                    }
+                }
+                return;
+            }
+        }
+        let mut at = 0;
+        while let Some((pattern, start, end)) = self.find_at(haystack, at) {
+            if f(pattern, start, end).is_break() {
+                return;
+            }
+            at = next_search_start(start, end);
+        }
+    }
+
+    /// Leftmost-longest match starting at or after `at`.
+    ///
+    /// `haystack` must already be lowercased for the packed engine.
+    fn find_at(&self, haystack: &[u8], at: usize) -> Option<(usize, usize, usize)> {
+        if at > haystack.len() {
+            return None;
+        }
+        let mat = match &self.engine {
+            Engine::Automaton(ac) => ac.find(Input::new(haystack).span(at..haystack.len())),
+            Engine::Packed(searcher) => searcher.find_in(haystack, Span::from(at..haystack.len())),
+        }?;
+        Some((mat.pattern().as_usize(), mat.start(), mat.end()))
+    }
+
+    /// Scan `haystack` in one chunk per thread and stitch the results.
+    ///
+    /// Each chunk is searched from its own start, collecting matches that
+    /// begin inside it. A match from the previous chunk can run past the
+    /// boundary, in which case the chunk is rescanned from where that match
+    /// ended until the rescan lands on a match end the chunk also found;
+    /// from there both searches continue from the same position, so the
+    /// rest of the chunk's matches are kept. The result is identical to a
+    /// sequential scan.
+    fn find_all_parallel(&self, haystack: &[u8], threads: usize) -> Vec<(usize, usize, usize)> {
+        let chunk_len = haystack.len().div_ceil(threads);
+        let bounds: Vec<(usize, usize)> = (0..haystack.len())
+            .step_by(chunk_len)
+            .map(|start| (start, (start + chunk_len).min(haystack.len())))
+            .collect();
+        let chunks: Vec<Vec<(usize, usize, usize)>> = std::thread::scope(|scope| {
+            let handles: Vec<_> = bounds
+                .iter()
+                .map(|&(start, end)| scope.spawn(move || self.find_in_chunk(haystack, start, end)))
+                .collect();
+            handles
+                .into_iter()
+                .map(|handle| handle.join().expect("matcher thread panicked"))
+                .collect()
+        });
+
+        let mut matches = Vec::new();
+        for (&(chunk_start, chunk_end), chunk) in bounds.iter().zip(chunks) {
+            let resume = matches
+                .last()
+                .map_or(0, |&(_, start, end)| next_search_start(start, end));
+            if resume <= chunk_start {
+                matches.extend(chunk);
+                continue;
+            }
+            let mut at = resume;
+            while let Some((pattern, start, end)) = self.find_at(haystack, at) {
+                if start >= chunk_end {
+                    break;
+                }
+                matches.push((pattern, start, end));
+                // chunk matches are sorted and non-overlapping, so are their ends
+                if let Ok(i) = chunk.binary_search_by_key(&end, |&(_, _, end)| end) {
+                    matches.extend_from_slice(&chunk[i + 1..]);
+                    break;
+                }
+                at = next_search_start(start, end);
+            }
+        }
+        matches
+    }
+
+    /// Matches found searching from `start` that also begin before `end`.
+    fn find_in_chunk(
+        &self,
+        haystack: &[u8],
+        start: usize,
+        end: usize,
+    ) -> Vec<(usize, usize, usize)> {
+        let mut matches = Vec::new();
+        let mut at = start;
+        while let Some((pattern, mat_start, mat_end)) = self.find_at(haystack, at) {
+            if mat_start >= end {
+                break;
+            }
+            matches.push((pattern, mat_start, mat_end));
+            at = next_search_start(mat_start, mat_end);
+        }
+        matches
+    }
+
+    /// Find all matches in `text`.
+    ///
+    /// Accepts any byte slice as well as `&str`, so callers holding raw
+    /// bytes (file contents, subprocess output) can match without first
+    /// validating them as UTF-8. Positions are byte offsets either way.
+    pub fn find_matches<T: AsRef<[u8]> + ?Sized>(
+        &self,
+        text: &T,
+        return_positions: bool,
+    ) -> Vec<Matched> {
+        let mut matches: Vec<Matched> = Vec::new();
+        self.find_matches_into(text, return_positions, &mut matches);
+        matches
+    }
+
+    /// Like `find_matches`, but refills a caller-owned vector.
+    ///
+    /// `matches` is cleared first. Reusing one vector across many texts keeps
+    /// its allocation, so the result buffer is not regrown per call. The
+    /// scan itself may still allocate: the packed engine lowercases a copy
+    /// of the text, and texts of `PARALLEL_MIN_BYTES` or more collect
+    /// per-chunk results on worker threads.
+    pub fn find_matches_into<T: AsRef<[u8]> + ?Sized>(
+        &self,
+        text: &T,
+        return_positions: bool,
+        matches: &mut Vec<Matched>,
+    ) {
+        matches.clear();
+        self.for_each_match(text.as_ref(), |pattern, start, end| {
+            matches.push(Matched {
+                term: Arc::clone(&self.patterns[pattern]),
+                id: self.ids[pattern],
+                nterm: Arc::clone(&self.nterms[pattern]),
+                pos: if return_positions {
+                    Some((start, end))
+                } else {
+                    None
+                },
+            });
+            ControlFlow::Continue(())
+        });
+    }
+
+    // This function replacing instead of matching patterns
+    //
+    // Single scan writing straight into the output buffer. Replacement ids
+    // are almost always shorter than the terms they replace, so sizing the
+    // buffer to the haystack avoids regrowing it.
+    pub fn replace_matches<T: AsRef<[u8]> + ?Sized>(&self, text: &T) -> Vec<u8> {
+        let haystack = text.as_ref();
+        let mut dst = Vec::with_capacity(haystack.len());
+        let mut last = 0;
+        self.for_each_match(haystack, |pattern, start, end| {
+            dst.extend_from_slice(&haystack[last..start]);
+            dst.extend_from_slice(&self.replacements[pattern]);
+            last = end;
+            ControlFlow::Continue(())
+        });
+        dst.extend_from_slice(&haystack[last..]);
+        dst
+    }
+
+    /// Like `replace_matches`, but streams the output to `dst`.
+    ///
+    /// Nothing is buffered here, so replacing a large document straight into
+    /// a file or socket never holds a second copy of it in memory. Wrap
+    /// unbuffered writers in a `BufWriter`; this issues one write per
+    /// unmatched gap and per replacement.
+    pub fn replace_matches_to<T: AsRef<[u8]> + ?Sized, W: Write>(
+        &self,
+        text: &T,
+        mut dst: W,
+    ) -> io::Result<()> {
+        let haystack = text.as_ref();
+        let mut last = 0;
+        let mut result = Ok(());
+        // Stop scanning at the first write error
+        self.for_each_match(haystack, |pattern, start, end| {
+            result = dst
+                .write_all(&haystack[last..start])
+                .and_then(|()| dst.write_all(&self.replacements[pattern]));
+            last = end;
+            if result.is_ok() {
+                ControlFlow::Continue(())
+            } else {
+                ControlFlow::Break(())
+            }
+        });
+        result?;
+        dst.write_all(&haystack[last..])
+    }
+}
+
+/// Number of threads used for parallel scans.
+///
+/// Looked up once: on Linux `available_parallelism` reads the affinity mask
+/// and cgroup quota, which costs more than matching a short text.
+fn parallelism() -> usize {
+    static THREADS: OnceLock<usize> = OnceLock::new();
+    *THREADS.get_or_init(|| std::thread::available_parallelism().map_or(1, |n| n.get()))
+}
+
+/// Where to resume searching after a match, stepping past empty matches.
+fn next_search_start(start: usize, end: usize) -> usize {
+    if end > start {
+        end
+    } else {
+        end + 1
+    }
+}
+
 pub fn find_matches(
     text: &str,
     dict_hash: AHashMap<String, Dictionary>,
     return_positions: bool,
 ) -> Result<Vec<Matched>, Box<dyn Error>> {
-    let patterns: Vec<String> = dict_hash.keys().cloned().collect();
-
-    let ac = AhoCorasick::builder()
-        .match_kind(MatchKind::LeftmostLongest)
-        .ascii_case_insensitive(true)
-        .build(patterns.clone())
-        .unwrap();
-
-    let mut matches: Vec<Matched> = Vec::new();
-    for mat in ac.find_iter(text) {
-        let term = &patterns[mat.pattern()];
-        matches.push(Matched {
-            term: term.clone(),
-            id: dict_hash.get(term).unwrap().id.clone(),
-            nterm: dict_hash.get(term).unwrap().nterm.clone(),
-            pos: if return_positions {
-                Some((mat.start(), mat.end()))
-            } else {
-                None
-            },
-        });
-    }
-    Ok(matches)
+    let matcher = Matcher::new(&dict_hash)?;
+    Ok(matcher.find_matches(text, return_positions))
 }
 
 // This function replacing instead of matching patterns
@@ -53,18 +517,214 @@ pub fn replace_matches(
     text: &str,
     dict_hash: AHashMap<String, Dictionary>,
 ) -> Result<Vec<u8>, Box<dyn Error>> {
-    let mut patterns: Vec<String> = Vec::new();
-    let mut replace_with: Vec<String> = Vec::new();
-    for (key, value) in dict_hash.iter() {
-        patterns.push(key.clone());
-        replace_with.push(value.clone().id.clone().to_string());
-    }
-    let ac = AhoCorasick::builder()
-        .match_kind(MatchKind::LeftmostLongest)
-        .ascii_case_insensitive(true)
-        .build(patterns)
-        .unwrap();
-
-    let result = ac.replace_all_bytes(text.as_bytes(), &replace_with);
-    Ok(result)
+    let matcher = Matcher::new(&dict_hash)?;
+    Ok(matcher.replace_matches(text))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn thesaurus() -> AHashMap<String, Dictionary> {
+        let mut dict_hash = AHashMap::new();
+        for (term, id, nterm) in [
+            ("project calendar", 1, "project schedule"),
+            ("strategic plan", 2, "strategy"),
+            ("organization strategic plan", 3, "strategy"),
+        ] {
+            dict_hash.insert(
+                term.to_string(),
+                Dictionary {
+                    id,
+                    nterm: nterm.to_string(),
+                },
+            );
+        }
+        dict_hash
+    }
+
+    #[test]
+    fn test_matcher_reused_across_texts() {
+        let matcher = Matcher::new(&thesaurus()).unwrap();
+        let matches = matcher.find_matches(
+            "I am a text with the word Organization strategic plan and project calendar",
+            true,
+        );
+        assert_eq!(matches.len(), 2);
+        assert_eq!(matches[0].id, 3);
+        assert_eq!(matches[0].pos, Some((26, 53)));
+        assert_eq!(&*matches[1].nterm, "project schedule");
+
+        let synonym = matcher.find_matches("a strategic plan", false);
+        assert_eq!(synonym.len(), 1);
+        assert_eq!(&*synonym[0].term, "strategic plan");
+        assert_eq!(synonym[0].pos, None);
+        // synonyms share one interned normalized term
+        assert!(Arc::ptr_eq(&synonym[0].nterm, &matches[0].nterm));
+
+        let mut reused = matches.clone();
+        matcher.find_matches_into("a strategic plan", false, &mut reused);
+        assert_eq!(reused, synonym);
+    }
+
+    #[test]
+    fn test_thesaurus_from_json() {
+        let json = r#"{
+            "project calendar": {"id": 1, "nterm": "project schedule"},
+            "strategic plan": {"id": 2, "nterm": "strategy"},
+            "organization strategic plan": {"id": 3, "nterm": "strat\u0065gy"}
+        }"#;
+        let parsed: Thesaurus = serde_json::from_str(json).unwrap();
+        assert_eq!(parsed.len(), 3);
+        // escaped and borrowed spellings of a normalized term intern together
+        assert!(Arc::ptr_eq(&parsed.nterms[1], &parsed.nterms[2]));
+
+        let text = "I am a text with the word Organization strategic plan and project calendar";
+        assert_eq!(
+            Matcher::from_thesaurus(parsed)
+                .unwrap()
+                .find_matches(text, true),
+            Matcher::new(&thesaurus()).unwrap().find_matches(text, true)
+        );
+    }
+
+    #[test]
+    fn test_thesaurus_duplicate_terms() {
+        let json = r#"{
+            "project calendar": {"id": 1, "nterm": "project schedule"},
+            "strategic plan": {"id": 2, "nterm": "strategy"},
+            "project calendar": {"id": 7, "nterm": "calendar"}
+        }"#;
+        let parsed: Thesaurus = serde_json::from_str(json).unwrap();
+        let dict_hash: AHashMap<String, Dictionary> = serde_json::from_str(json).unwrap();
+        assert_eq!(parsed.len(), dict_hash.len());
+
+        // the last entry wins, as it does when collecting into the map
+        let text = "see the project calendar";
+        let matches = Matcher::from_thesaurus(parsed)
+            .unwrap()
+            .find_matches(text, true);
+        assert_eq!(matches[0].id, 7);
+        assert_eq!(&*matches[0].nterm, "calendar");
+        assert_eq!(matches, Matcher::new(&dict_hash).unwrap().find_matches(text, true));
+    }
+
+    #[test]
+    fn test_matcher_replace_matches() {
+        let matcher = Matcher::new(&thesaurus()).unwrap();
+        let replaced = matcher.replace_matches("see the project calendar");
+        assert_eq!(String::from_utf8(replaced).unwrap(), "see the 1");
+
+        let mut streamed = Vec::new();
+        matcher
+            .replace_matches_to("a strategic plan for the project calendar.", &mut streamed)
+            .unwrap();
+        assert_eq!(streamed, b"a 2 for the 1.");
+    }
+
+    #[test]
+    fn test_replace_matches_to_stops_on_error() {
+        // Accepts a fixed number of writes, then fails every one after it
+        struct FailAfter(usize);
+
+        impl Write for FailAfter {
+            fn write(&mut self, buf: &[u8]) -> io::Result<usize> {
+                assert!(self.0 > 0, "write after an error was reported");
+                self.0 -= 1;
+                if self.0 == 0 {
+                    return Err(io::Error::new(io::ErrorKind::BrokenPipe, "closed"));
+                }
+                Ok(buf.len())
+            }
+
+            fn flush(&mut self) -> io::Result<()> {
+                Ok(())
+            }
+        }
+
+        let matcher = Matcher::new(&thesaurus()).unwrap();
+        let text = "project calendar ".repeat(100);
+        let err = matcher.replace_matches_to(&text, FailAfter(1)).unwrap_err();
+        assert_eq!(err.kind(), io::ErrorKind::BrokenPipe);
+
+        // the scan itself stops too, on the sequential and parallel paths
+        for text in [text, "project calendar ".repeat(PARALLEL_MIN_BYTES / 8)] {
+            let mut calls = 0;
+            matcher.for_each_match(text.as_bytes(), |_, _, _| {
+                calls += 1;
+                ControlFlow::Break(())
+            });
+            assert_eq!(calls, 1);
+        }
+    }
+
+    #[test]
+    fn test_matcher_accepts_bytes() {
+        let matcher = Matcher::new(&thesaurus()).unwrap();
+        let text = "see the Project Calendar";
+        assert_eq!(
+            matcher.find_matches(text.as_bytes(), true),
+            matcher.find_matches(text, true)
+        );
+        assert_eq!(matcher.replace_matches(text.as_bytes()), b"see the 1");
+    }
+
+    #[test]
+    fn test_packed_and_automaton_agree() {
+        let dict_hash = thesaurus();
+        let packed = Matcher::new(&dict_hash).unwrap();
+        let automaton = Matcher::builder().packed(false).build(&dict_hash).unwrap();
+        assert!(matches!(packed.engine, Engine::Packed(_)));
+        assert!(matches!(automaton.engine, Engine::Automaton(_)));
+
+        let text = "ORGANIZATION Strategic Plan, strategic plan and Project Calendar: ünïcode project calendar";
+        assert_eq!(
+            packed.find_matches(text, true),
+            automaton.find_matches(text, true)
+        );
+        assert_eq!(
+            packed.replace_matches(text),
+            automaton.replace_matches(text)
+        );
+
+        let dfa = Matcher::builder()
+            .packed(false)
+            .kind(Some(AhoCorasickKind::DFA))
+            .build(&dict_hash)
+            .unwrap();
+        assert_eq!(
+            dfa.find_matches(text, true),
+            automaton.find_matches(text, true)
+        );
+    }
+
+    #[test]
+    fn test_parallel_scan_matches_sequential() {
+        let dict_hash = thesaurus();
+        let text = "organization strategic plan, Organization Strategic Plan and a project calendar; strategic plans. "
+            .repeat(50);
+        for matcher in [
+            Matcher::new(&dict_hash).unwrap(),
+            Matcher::builder().packed(false).build(&dict_hash).unwrap(),
+        ] {
+            let lowered = text.to_ascii_lowercase();
+            let haystack = match matcher.engine {
+                Engine::Packed(_) => lowered.as_bytes(),
+                Engine::Automaton(_) => text.as_bytes(),
+            };
+            let sequential = matcher.find_in_chunk(haystack, 0, haystack.len());
+            assert_eq!(sequential.len(), 200);
+            // odd thread counts put chunk boundaries inside terms
+            for threads in 1..=17 {
+                assert_eq!(matcher.find_all_parallel(haystack, threads), sequential);
+            }
+        }
+
+        let large = text.repeat(PARALLEL_MIN_BYTES / text.len() + 1);
+        let matcher = Matcher::new(&dict_hash).unwrap();
+        assert_eq!(
+            matcher.find_matches(&large, true).len(),
+            200 * (PARALLEL_MIN_BYTES / text.len() + 1)
+        );
+    }
 }
@@ -8,21 +8,26 @@
 use ahash::AHashMap;
 use criterion::{criterion_group, criterion_main, BenchmarkId, Criterion, Throughput};
 use lazy_static::lazy_static;
-use terraphim_automata::load_automata;
-use terraphim_automata::matcher::{find_matches, find_matches_ids, replace_matches, Dictionary};
+use terraphim_automata::load_automata_from_bytes;
+use terraphim_automata::matcher::{find_matches, Dictionary, Matcher};
 use terraphim_pipeline::input::TEST_CORPUS;
 use terraphim_pipeline::split_paragraphs;
 use terraphim_pipeline::RoleGraph;
 
+// Thesaurus is embedded at compile time so benchmark setup does not
+// depend on fetching it over the network
 lazy_static! {
     static ref AUTOMATA: AHashMap<String, Dictionary> = {
         let dict_hash =
-            load_automata("https://system-operator.s3.eu-west-2.amazonaws.com/term_to_id.json")
-                .unwrap();
+            load_automata_from_bytes(include_bytes!("../data/term_to_id.json")).unwrap();
         dict_hash
     };
 }
 
+lazy_static! {
+    static ref MATCHER: Matcher = Matcher::new(&AUTOMATA).unwrap();
+}
+
 // static ROLEGRAPH: Lazy<RoleGraph> = Lazy::new(|| {
 //     let role = "system operator".to_string();
 //     let automata_url = "https://system-operator.s3.eu-west-2.amazonaws.com/term_to_id.json";
@@ -32,9 +37,10 @@ lazy_static! {
 lazy_static! {
     static ref ROLEGRAPH: RoleGraph = {
         let role = "system operator".to_string();
-        let automata_url = "https://system-operator.s3.eu-west-2.amazonaws.com/term_to_id.json";
-        let rolegraph = RoleGraph::new(role, automata_url);
-        rolegraph.unwrap()
+        // Same thesaurus as AUTOMATA, read from disk rather than the network
+        let automata_url = concat!(env!("CARGO_MANIFEST_DIR"), "/data/term_to_id.json");
+        let rt = tokio::runtime::Runtime::new().unwrap();
+        rt.block_on(RoleGraph::new(role, automata_url)).unwrap()
     };
 }
 
@@ -48,7 +54,7 @@ fn bench_find_matches_ids(c: &mut Criterion) {
         move |b, &&size| {
             let query = query.repeat(size);
 
-            b.iter(|| find_matches_ids(&rolegraph.ac, &rolegraph.ac_values, &query))
+            b.iter(|| rolegraph.find_matches_ids(&query))
         },
         &[1, 10, 100, 1000],
     );
@@ -56,10 +62,45 @@ fn bench_find_matches_ids(c: &mut Criterion) {
 fn bench_find_matches(c: &mut Criterion) {
     let query = "I am a text with the word Life cycle concepts and bar and Trained operators and maintainers, project direction, some bingo words Paradigm Map and project planning, then again: some bingo words Paradigm Map and project planning, then repeats: Trained operators and maintainers, project direction";
 
+    let matcher = &*MATCHER;
     c.bench_function("find_matches", |b| {
+        b.iter(|| matcher.find_matches(query, false))
+    });
+}
+
+/// The free `find_matches` function builds a new automaton on every call,
+/// so this is dominated by construction; compare against `find_matches`
+/// above, which reuses one `Matcher`.
+fn bench_find_matches_rebuilt(c: &mut Criterion) {
+    let query = "I am a text with the word Life cycle concepts and bar and Trained operators and maintainers, project direction, some bingo words Paradigm Map and project planning, then again: some bingo words Paradigm Map and project planning, then repeats: Trained operators and maintainers, project direction";
+
+    c.bench_function("find_matches_rebuilt", |b| {
         b.iter(|| find_matches(query, AUTOMATA.clone(), false))
     });
 }
+
+/// Ten scans of the same text, once against a single `Matcher` built
+/// outside the timed loop and once rebuilding the automaton for every scan.
+fn bench_repeated_matching(c: &mut Criterion) {
+    let query = "I am a text with the word Life cycle concepts and bar and Trained operators and maintainers, project direction, some bingo words Paradigm Map and project planning, then again: some bingo words Paradigm Map and project planning, then repeats: Trained operators and maintainers, project direction";
+    let mut group = c.benchmark_group("repeated_matching");
+    let matcher = &*MATCHER;
+    group.bench_function("prebuilt", |b| {
+        b.iter(|| {
+            (0..10)
+                .map(|_| matcher.find_matches(query, true))
+                .collect::<Vec<_>>()
+        })
+    });
+    group.bench_function("rebuilt", |b| {
+        b.iter(|| {
+            (0..10)
+                .map(|_| find_matches(query, AUTOMATA.clone(), true).unwrap())
+                .collect::<Vec<_>>()
+        })
+    });
+    group.finish();
+}
 fn bench_split_paragraphs(c: &mut Criterion) {
     let paragraph = "This is the first sentence.\n\n This is the second sentence. This is the second sentence? This is the second sentence| This is the second sentence!\n\nThis is the third sentence. Mr. John Johnson Jr. was born in the U.S.A but earned his Ph.D. in Israel before joining Nike Inc. as an engineer. He also worked at craigslist.org as a business analyst.";
     c.bench_function("split_paragraphs", |b| {
@@ -69,8 +110,9 @@ fn bench_split_paragraphs(c: &mut Criterion) {
 fn bench_replace_matches(c: &mut Criterion) {
     let query = "I am a text with the word Life cycle concepts and bar and Trained operators and maintainers, project direction, some bingo words Paradigm Map and project planning, then again: some bingo words Paradigm Map and project planning, then repeats: Trained operators and maintainers, project direction";
 
+    let matcher = &*MATCHER;
     c.bench_function("replace_matches", |b| {
-        b.iter(|| replace_matches(query, AUTOMATA.clone()).unwrap())
+        b.iter(|| matcher.replace_matches(query))
     });
 }
 fn bench_parse_document_to_pair(c: &mut Criterion) {
@@ -157,6 +199,8 @@ criterion_group!(
     benches,
     bench_find_matches_ids,
     bench_find_matches,
+    bench_find_matches_rebuilt,
+    bench_repeated_matching,
     bench_split_paragraphs,
     bench_replace_matches,
     bench_parse_document_to_pair,
@@ -4,7 +4,7 @@ use memoize::memoize;
 use regex::Regex;
 use std::collections::hash_map::Entry;
 pub mod input;
-use aho_corasick::{AhoCorasick, MatchKind};
+use aho_corasick::{AhoCorasick, AhoCorasickKind, MatchKind};
 use log::warn;
 use serde::{Deserialize, Serialize};
 
@@ -15,6 +15,9 @@ use unicode_segmentation::UnicodeSegmentation;
 
 type Result<T> = std::result::Result<T, TerraphimPipelineError>;
 
+/// Largest thesaurus the rolegraph automaton is compiled to a DFA for.
+const DFA_MAX_PATTERNS: usize = 2_000;
+
 #[derive(Error, Debug)]
 pub enum TerraphimPipelineError {
     #[error("The given node ID was not found")]
@@ -128,9 +131,19 @@ impl RoleGraph {
             ac_reverse_nterm.insert(value.id, value.nterm.clone());
         }
 
+        // The rolegraph automaton lives for the whole process and scans every
+        // indexed document. A DFA scans small thesauri several times faster,
+        // but its memory grows roughly tenfold over the default and it stops
+        // being faster on large ones, so leave those to aho-corasick
+        let kind = if keys.len() <= DFA_MAX_PATTERNS {
+            Some(AhoCorasickKind::DFA)
+        } else {
+            None
+        };
         let ac = AhoCorasick::builder()
             .match_kind(MatchKind::LeftmostLongest)
             .ascii_case_insensitive(true)
+            .kind(kind)
             .build(keys)?;
 
         Ok(Self {
@@ -148,7 +161,7 @@ impl RoleGraph {
 
     /// Find all matches int the rolegraph for the given text
     /// Returns a list of ids of the matched nodes
-    fn find_matches_ids(&self, text: &str) -> Vec<u64> {
+    pub fn find_matches_ids(&self, text: &str) -> Vec<u64> {
         let mut matches = Vec::new();
         for mat in self.ac.find_iter(text) {
             // println!("mat: {:?}", mat);
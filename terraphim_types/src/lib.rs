@@ -103,13 +103,36 @@ impl ConfigState {
         };
 
         // for each role in a config initialize a rolegraph
-        // and add it to the config state
+        // and add it to the config state.
+        // Roles commonly share a thesaurus, so roles are grouped by automata
+        // url: each url is fetched and compiled once, and only the second and
+        // later roles of a group get a clone of its rolegraph
+        let mut roles_by_url: HashMap<String, Vec<String>> = HashMap::new();
         for (role_name, each_role) in config.roles {
-            let automata_url = each_role.kg.automata_url.as_str();
-            println!("{} - {}", role_name.clone(), automata_url);
-            let rolegraph = RoleGraph::new(role_name.clone(), automata_url).await?;
+            println!("{} - {}", role_name, each_role.kg.automata_url);
+            roles_by_url
+                .entry(each_role.kg.automata_url)
+                .or_default()
+                .push(role_name);
+        }
+        for (automata_url, role_names) in roles_by_url {
+            let mut role_names = role_names.into_iter();
+            let Some(first_role) = role_names.next() else {
+                continue;
+            };
+            let rolegraph = RoleGraph::new(first_role.clone(), &automata_url).await?;
+            for role_name in role_names {
+                let mut shared = rolegraph.clone();
+                shared.role = role_name.clone();
+                config_state.roles.insert(
+                    role_name,
+                    RoleGraphState {
+                        rolegraph: Arc::new(Mutex::new(shared)),
+                    },
+                );
+            }
             config_state.roles.insert(
-                role_name,
+                first_role,
                 RoleGraphState {
                     rolegraph: Arc::new(Mutex::new(rolegraph)),
                 },